@@ -0,0 +1,4 @@
+"""
+ConcenTrack periodically captures the screen and logs a categorized summary
+of what the user is doing.
+"""
@@ -0,0 +1,148 @@
+"""
+Summarizing screenshots asynchronously through the OpenAI Batch API.
+"""
+import json
+import os
+
+from .llm import (
+    build_analysis_request, cache_put_key, client, failed_result, parse_analysis,
+    save_cache, text_key,
+)
+from .log import append_jsonl, flush_io, log_file, log_summary, read_jsonl, submit_io
+
+# Requests accumulate here and are submitted to the Batch API
+batch_flush_interval = 60 * 60
+batch_input_file = os.path.expanduser("./productivity/batch_pending.jsonl")
+batch_meta_file = os.path.expanduser("./productivity/batch_pending_meta.jsonl")
+batch_jobs_file = os.path.expanduser("./productivity/batch_jobs.json")
+
+
+def _load_batch_jobs():
+    if not os.path.exists(batch_jobs_file):
+        return {}
+    with open(batch_jobs_file, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+
+def _save_batch_jobs(jobs):
+    with open(batch_jobs_file, "w") as f:
+        json.dump(jobs, f, indent=4)
+
+
+def queue_batch_request(log_entry, item, same_as=None, vision=False):
+    """
+    Appends a chat completion request for the Batch API to the pending file.
+    The log entry is kept alongside so it can be completed once results arrive.
+    If same_as is given, no request is sent and the entry reuses that result.
+    """
+    if same_as is not None:
+        append_jsonl(batch_meta_file, dict(log_entry, same_as=same_as))
+        return
+
+    append_jsonl(batch_input_file, {
+        "custom_id": log_entry["timestamp"],
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": build_analysis_request(item, vision),
+    })
+    if vision:
+        append_jsonl(batch_meta_file, log_entry)
+    else:
+        # Kept so the result can be cached under this OCR text once it arrives
+        append_jsonl(batch_meta_file, dict(log_entry, cache_key=text_key(item)))
+
+
+def submit_batch():
+    """
+    Uploads the pending requests and submits them as a single batch job.
+    """
+    pending = read_jsonl(batch_meta_file)
+    if not pending:
+        return None
+
+    try:
+        with open(batch_input_file, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+    except Exception as e:
+        print(f"Error submitting batch: {e}")
+        return None
+
+    jobs = _load_batch_jobs()
+    jobs[batch.id] = {entry["timestamp"]: entry for entry in pending}
+    _save_batch_jobs(jobs)
+
+    if os.path.exists(batch_input_file):
+        os.remove(batch_input_file)
+    os.remove(batch_meta_file)
+    print(f"Submitted batch {batch.id} with {len(pending)} screenshots")
+    return batch.id
+
+
+def collect_batches():
+    """
+    Polls submitted batch jobs and logs the results of any that have finished.
+    """
+    jobs = _load_batch_jobs()
+    if not jobs:
+        return
+
+    cached = False
+    for batch_id, entries in list(jobs.items()):
+        try:
+            batch = client.batches.retrieve(batch_id)
+        except Exception as e:
+            print(f"Error checking batch {batch_id}: {e}")
+            continue
+
+        if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+            continue
+
+        # Expired and cancelled batches can still have partial results
+        results = {}
+        if batch.output_file_id:
+            try:
+                output = client.files.content(batch.output_file_id).text
+            except Exception as e:
+                print(f"Error downloading batch {batch_id}: {e}")
+                continue
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    content = item["response"]["body"]["choices"][0]["message"]["content"]
+                    results[item["custom_id"]] = parse_analysis(content)
+                except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                    continue
+        if batch.status != "completed":
+            print(f"Batch {batch_id} ended with status: {batch.status}")
+
+        for timestamp, log_entry in sorted(entries.items()):
+            cache_key = log_entry.pop("cache_key", None)
+            if cache_key and timestamp in results:
+                cache_put_key(cache_key, results[timestamp])
+                cached = True
+            analysis = results.get(
+                log_entry.pop("same_as", timestamp),
+                failed_result())
+            log_entry["summary"] = analysis["text"]
+            log_entry["category"] = analysis["category"]
+            submit_io(log_summary, log_entry)
+
+        # Only forget the job once its results are actually on disk
+        flush_io()
+        del jobs[batch_id]
+        _save_batch_jobs(jobs)
+        print(f"Logged {len(entries)} results from batch {batch_id} to: {log_file}")
+
+    if cached:
+        save_cache()
+
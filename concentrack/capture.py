@@ -0,0 +1,106 @@
+"""
+Screen capture and user activity on macOS.
+"""
+import io
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+try:
+    from Quartz import (
+        CGDataProviderCopyData, CGImageGetBytesPerRow, CGImageGetDataProvider,
+        CGImageGetHeight, CGImageGetWidth, CGRectInfinite,
+        CGWindowListCreateImage, kCGNullWindowID, kCGWindowImageDefault,
+        kCGWindowListOptionOnScreenOnly,
+    )
+except ImportError:
+    CGWindowListCreateImage = None
+
+try:
+    from Quartz import (
+        CGWindowListCopyWindowInfo, kCGWindowLayer, kCGWindowListExcludeDesktopElements,
+        kCGWindowOwnerName,
+    )
+except ImportError:
+    CGWindowListCopyWindowInfo = None
+
+try:
+    from Quartz import (
+        CGEventSourceSecondsSinceLastEventType, kCGAnyInputEventType,
+        kCGEventSourceStateCombinedSessionState,
+    )
+except ImportError:
+    CGEventSourceSecondsSinceLastEventType = None
+
+
+def grab():
+    """
+    Captures the whole screen as an in-memory PIL image.
+    Uses Quartz directly when available, which avoids spawning screencapture
+    and the PNG encode/decode round-trip through the filesystem.
+    Raises an exception if the screen couldn't be captured.
+    """
+    if CGWindowListCreateImage is None:
+        # Have screencapture write an uncompressed BMP to the pipe, not a file
+        result = subprocess.run(
+            ["screencapture", "-x", "-t", "bmp", "/dev/stdout"],
+            stdout=subprocess.PIPE,
+        )
+        image = Image.open(io.BytesIO(result.stdout))
+        image.load()
+        return image
+
+    img = CGWindowListCreateImage(
+        CGRectInfinite, kCGWindowListOptionOnScreenOnly,
+        kCGNullWindowID, kCGWindowImageDefault)
+    if img is None:
+        raise RuntimeError("CGWindowListCreateImage returned no image")
+    w = CGImageGetWidth(img)
+    h = CGImageGetHeight(img)
+    stride = CGImageGetBytesPerRow(img)
+    data = CGDataProviderCopyData(CGImageGetDataProvider(img))
+    return Image.frombuffer("RGBA", (w, h), bytes(data), "raw", "BGRA", stride, 1)
+
+
+def get_active_application():
+    """
+    Returns the name of the application owning the frontmost window on macOS.
+    This runs in-process instead of forking osascript on every capture, and
+    unlike NSWorkspace it doesn't depend on a Cocoa run loop to stay current.
+    """
+    if CGWindowListCopyWindowInfo is None:
+        return "Unknown"
+    try:
+        windows = CGWindowListCopyWindowInfo(
+            kCGWindowListOptionOnScreenOnly | kCGWindowListExcludeDesktopElements,
+            kCGNullWindowID)
+        # Windows are ordered front to back; layer 0 skips the menu bar and Dock
+        for window in windows or []:
+            if window.get(kCGWindowLayer) == 0:
+                return window.get(kCGWindowOwnerName) or "Unknown"
+        return "Unknown"
+    except Exception:
+        return "Unknown"
+
+
+def seconds_since_input():
+    """
+    Returns how many seconds ago the user last used the keyboard or mouse.
+    Returns 0 (always active) when Quartz is unavailable.
+    """
+    if CGEventSourceSecondsSinceLastEventType is None:
+        return 0
+    return CGEventSourceSecondsSinceLastEventType(
+        kCGEventSourceStateCombinedSessionState, kCGAnyInputEventType)
+
+
+def dhash(image):
+    """
+    Computes a 64-bit difference hash used to detect unchanged screens.
+    """
+    g = image.convert("L").resize((9, 8), Image.BILINEAR)
+    a = np.asarray(g, dtype=np.int16)
+    bits = (a[:, 1:] > a[:, :-1]).flatten()
+    return int("".join("1" if x else "0" for x in bits), 2)
+
@@ -0,0 +1,400 @@
+"""
+Categorizing and summarizing screenshots with OpenAI (or categorizing with
+an optional local model), plus a result cache.
+"""
+import asyncio
+import base64
+import collections
+import hashlib
+import io
+import json
+import os
+import pickle
+import threading
+
+import tiktoken
+from PIL import Image
+from openai import AsyncOpenAI, OpenAI
+
+from .log import submit_io
+
+try:
+    from llama_cpp import Llama
+except ImportError:
+    Llama = None
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Used for the packed requests so they overlap with capturing and OCR
+aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# The small model is plenty for picking one of a handful of labels
+MODEL = "gpt-4o-mini"
+CATEGORIES = ["Work", "Communication", "Browsing",
+              "Entertainment", "Idle/Empty Screen"]
+# Returned whenever the model didn't produce a summary. These are never
+# cached, see is_failed()
+FAILED_RESULT = {"text": "Summary generation failed", "category": "Uncategorized"}
+# Upper bound on output tokens for one {category, summary} object
+max_result_tokens = 100
+# Screenshots sent to the vision model are scaled down to this width
+vision_width = 1024
+
+# OCR text is clipped to this many tokens (keeping its beginning and end),
+# per item for packed requests
+max_text_tokens = 1500
+max_item_tokens = 500
+# Loaded on first use, see _get_encoding()
+# None until first used, False if it couldn't be loaded
+_enc = None
+# Rough size of a token, for clipping when tiktoken isn't available
+chars_per_token = 4
+
+# Optional quantized local model (e.g. Phi-3-mini-4k-instruct Q4_K_M GGUF)
+# used to categorize OCR text, so OpenAI is only asked for the summary
+local_model_path = os.getenv("CONCENTRACK_LOCAL_MODEL")
+_local_llm = None
+_local_llm_lock = threading.Lock()
+
+# Results for previously seen OCR text, keyed by a hash of the text
+cache_file = os.path.expanduser("./productivity/summary_cache.pkl")
+cache_size = 512
+_summary_cache = None
+
+
+def normalize_category(category):
+    """
+    Maps the model's category onto one of CATEGORIES, or "Uncategorized".
+    """
+    category = str(category).strip().strip(".").lower()
+    for name in CATEGORIES:
+        if category == name.lower():
+            return name
+    # Short completions may cut a label off, e.g. "Idle/Empty"
+    for name in CATEGORIES:
+        if category and name.lower().startswith(category):
+            return name
+    return "Uncategorized"
+
+
+def failed_result():
+    """
+    Returns a fresh copy of FAILED_RESULT.
+    """
+    return dict(FAILED_RESULT)
+
+
+def is_failed(result):
+    """
+    Returns True if result is a failed summary rather than a real one.
+    """
+    return result["text"] == FAILED_RESULT["text"]
+
+
+def _result_from(output):
+    # Builds a result dict from one {category, summary} object from the model
+    summary = str(output.get("summary") or "").strip()
+    if not summary:
+        return failed_result()
+    return {"text": summary, "category": normalize_category(output.get("category"))}
+
+
+def _get_local_llm():
+    """
+    Returns the local categorization model, loading it on first use.
+    Returns None if it isn't configured or failed to load.
+    """
+    global _local_llm
+    if _local_llm is None:
+        _local_llm = False
+        if Llama is not None and local_model_path:
+            try:
+                _local_llm = Llama(model_path=local_model_path, n_ctx=4096,
+                                   logits_all=False, n_gpu_layers=-1, verbose=False)
+            except Exception as e:
+                print(f"Error loading local model, categorizing with OpenAI: {e}")
+    return _local_llm or None
+
+
+def load_local_model():
+    """
+    Loads the local categorization model, if configured. Call this before
+    the capture loop starts so analyze_packed() never loads it on the event loop.
+    """
+    return _get_local_llm() is not None
+
+
+def has_local_categorizer():
+    return bool(_local_llm)
+
+
+def categorize_local(text):
+    """
+    Categorizes the extracted text with the local model.
+    """
+    llm = _get_local_llm()
+    try:
+        prompt = (
+            "Categorize the following text into one of the categories: "
+            + ", ".join(CATEGORIES)
+            + ".\n\nText:\n"
+            + clip_text(text, max_text_tokens)
+            + "\n\nCategory:"
+        )
+        # llama.cpp contexts can't be shared between threads
+        with _local_llm_lock:
+            out = llm.create_chat_completion(
+                messages=[{"role": "system", "content": "You are a classifier that categorizes user activity based on what you see on the user's screen."},
+                          {"role": "user", "content": prompt}],
+                max_tokens=8,
+                temperature=0,
+            )
+        return normalize_category(out["choices"][0]["message"]["content"])
+    except Exception:
+        return "Uncategorized"
+
+
+def _get_encoding():
+    # tiktoken may download the BPE file the first time, so only do this
+    # once text actually needs clipping
+    global _enc
+    if _enc is None:
+        try:
+            _enc = tiktoken.encoding_for_model(MODEL)
+        except Exception as e:
+            print(f"Error loading tiktoken encoding, clipping by characters instead: {e}")
+            _enc = False
+    return _enc
+
+
+def clip_text(text, limit):
+    """
+    Shortens text to about limit tokens, keeping its beginning and end.
+    """
+    enc = _get_encoding()
+    if not enc:
+        if len(text) <= limit * chars_per_token:
+            return text
+        half = limit * chars_per_token // 2
+        return text[:half] + "\n...\n" + text[-half:]
+
+    toks = enc.encode(text, disallowed_special=())
+    if len(toks) <= limit:
+        return text
+    half = limit // 2
+    return enc.decode(toks[:half]) + "\n...\n" + enc.decode(toks[-half:])
+
+
+def encode_image(image):
+    """
+    Downscales a screenshot and returns it as a base64 PNG data URL.
+    """
+    w, h = image.size
+    if w > vision_width:
+        image = image.resize((vision_width, h * vision_width // w), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _image_part(image_url):
+    # "low" detail caps each image at a fixed, small number of tokens
+    return {"type": "image_url", "image_url": {"url": image_url, "detail": "low"}}
+
+
+def build_analysis_request(item, vision=False, with_category=True):
+    """
+    Builds the chat completion request body asking for a category and summary
+    (or just the summary if with_category is False).
+    item is the extracted text, or a screenshot data URL if vision is True.
+    """
+    source = "their screen" if vision else "the text on their screen"
+    if with_category:
+        fields = ("Return JSON with fields `category` (one of "
+                  + ", ".join(CATEGORIES)
+                  + ") and `summary` (at most 40 words).")
+    else:
+        fields = "Return JSON with the field `summary` (at most 40 words)."
+    system_prompt = f"You explain what the user is doing based on {source}. " + fields
+    if vision:
+        prompt = [{"type": "text", "text": "This is the user's screen."},
+                  _image_part(item)]
+    else:
+        item = clip_text(item, max_text_tokens)
+        prompt = (
+            f"the following describes what is on the user's screen.:\n\n"
+            f"{item}"
+        )
+    return {
+        "model": MODEL,
+        "response_format": {"type": "json_object"},
+        "messages": [{"role": "system", "content": system_prompt},
+                     {"role": "user", "content": prompt}],
+        "temperature": 0.3,
+        "max_tokens": max_result_tokens,
+    }
+
+
+def parse_analysis(content):
+    """
+    Parses the JSON returned by the model into a summary/category dict.
+    """
+    try:
+        result = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return failed_result()
+    if not isinstance(result, dict):
+        return failed_result()
+
+    return _result_from(result)
+
+
+def build_packed_request(items, vision=False, with_category=True):
+    """
+    Builds one chat completion request that categorizes and summarizes several
+    screenshots at once, so the system prompt is only sent a single time.
+    items are extracted texts, or screenshot data URLs if vision is True.
+    """
+    if vision:
+        description = (
+            "You explain what the user is doing based on their screen. "
+            "Each item below is a separate screenshot. ")
+    else:
+        description = (
+            "You explain what the user is doing based on the text on their screen. "
+            "Each item below is the text from a separate screenshot. ")
+    system_prompt = (
+        description
+        + "Return JSON of the form {\"items\": [...]}. For each item output "
+        + ("{\"i\": index, \"category\": one of "
+           + ", ".join(CATEGORIES)
+           + ", \"summary\": at most 40 words}."
+           if with_category else
+           "{\"i\": index, \"summary\": at most 40 words}.")
+    )
+    if vision:
+        prompt = [{"type": "text", "text": "Items:"}]
+        for i, image_url in enumerate(items):
+            prompt += [{"type": "text", "text": f"[{i}]"}, _image_part(image_url)]
+    else:
+        prompt = "Items:\n" + "\n".join(
+            f"[{i}] {clip_text(text, max_item_tokens)}" for i, text in enumerate(items))
+    return {
+        "model": MODEL,
+        "response_format": {"type": "json_object"},
+        "messages": [{"role": "system", "content": system_prompt},
+                     {"role": "user", "content": prompt}],
+        "temperature": 0.3,
+        "max_tokens": max_result_tokens * len(items),
+    }
+
+
+async def analyze_packed(items, vision=False):
+    """
+    Categorizes and summarizes several screenshots with a single OpenAI call.
+    If a local model is configured, it categorizes the texts while OpenAI
+    writes the summaries. Returns one result dict per item, in order.
+    """
+    local = not vision and has_local_categorizer()
+    if local:
+        categories = asyncio.create_task(
+            asyncio.to_thread(lambda: [categorize_local(text) for text in items]))
+
+    results = [failed_result() for _ in items]
+    try:
+        response = await aclient.chat.completions.create(
+            **build_packed_request(items, vision, with_category=not local))
+        outputs = json.loads(response.choices[0].message.content)["items"]
+    except Exception:
+        outputs = []
+    if not isinstance(outputs, list):
+        outputs = []
+
+    for item in outputs:
+        try:
+            i = int(item["i"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= i < len(items):
+            results[i] = _result_from(item)
+
+    if local:
+        try:
+            local_categories = await categories
+        except Exception as e:
+            print(f"Error categorizing with the local model: {e}")
+            local_categories = ["Uncategorized"] * len(items)
+        for result, category in zip(results, local_categories):
+            result["category"] = category
+    return results
+
+
+def text_key(text):
+    """
+    Returns the cache key for a piece of OCR text.
+    """
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _get_cache():
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = collections.OrderedDict()
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "rb") as f:
+                    _summary_cache.update(pickle.load(f))
+            except Exception as e:
+                print(f"Error loading summary cache: {e}")
+    return _summary_cache
+
+
+def cache_get(text):
+    """
+    Returns the cached result for this exact OCR text, or None.
+    """
+    cache = _get_cache()
+    key = text_key(text)
+    if key not in cache:
+        return None
+    cache.move_to_end(key)
+    return dict(cache[key])
+
+
+def cache_put(text, result):
+    """
+    Remembers a successful result for this OCR text.
+    """
+    cache_put_key(text_key(text), result)
+
+
+def cache_put_key(key, result):
+    """
+    Remembers a successful result under a key from text_key(), evicting the
+    least recently used entries beyond cache_size.
+    """
+    if is_failed(result):
+        return
+    cache = _get_cache()
+    cache[key] = dict(result)
+    cache.move_to_end(key)
+    while len(cache) > cache_size:
+        cache.popitem(last=False)
+
+
+def _write_cache(snapshot):
+    try:
+        with open(cache_file, "wb") as f:
+            pickle.dump(snapshot, f)
+    except Exception as e:
+        print(f"Error saving summary cache: {e}")
+
+
+def save_cache():
+    """
+    Writes the summary cache to disk on the background I/O thread so it
+    survives restarts. The snapshot is taken here, not on the I/O thread.
+    """
+    if _summary_cache is None:
+        return
+    submit_io(_write_cache, dict(_summary_cache))
+
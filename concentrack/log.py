@@ -0,0 +1,105 @@
+"""
+The JSON Lines summary log, and a background thread for disk writes.
+"""
+import json
+import os
+import queue
+import threading
+
+log_file = os.path.expanduser("./productivity/summary_log.jsonl")
+# Logs written before switching to JSON Lines, converted once by migrate_log()
+legacy_log_file = os.path.expanduser("./productivity/summary_log.json")
+
+# Disk writes queued by submit_io() run on a single daemon thread, in order
+_io_q = queue.Queue()
+_io_thread = None
+
+
+def append_jsonl(path, data):
+    """
+    Appends data to a JSON Lines file as one compact line.
+    """
+    with open(path, "a") as f:
+        f.write(json.dumps(data, separators=(",", ":")) + "\n")
+
+
+def read_jsonl(path):
+    """
+    Returns every entry of a JSON Lines file, or [] if it doesn't exist.
+    """
+    if not os.path.exists(path):
+        return []
+    return list(read_log(path))
+
+
+def log_summary(data):
+    """
+    Appends structured data to the JSON Lines log file, one entry per line.
+    """
+    try:
+        append_jsonl(log_file, data)
+    except Exception as e:
+        print(f"Error logging data: {e}")
+
+
+def read_log(path=None):
+    """
+    Yields the logged entries in order.
+    """
+    with open(path or log_file, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def migrate_log(old_path=None, new_path=None):
+    """
+    Converts a legacy JSON array log into JSON Lines, appending to new_path.
+    The old file is renamed with a .bak suffix so this only runs once.
+    """
+    old_path = old_path or legacy_log_file
+    new_path = new_path or log_file
+    if not os.path.exists(old_path):
+        return
+
+    with open(old_path, "r") as f:
+        try:
+            logs = json.load(f)
+        except json.JSONDecodeError:
+            print(f"Could not migrate corrupt log: {old_path}")
+            return
+
+    for data in logs:
+        append_jsonl(new_path, data)
+    os.rename(old_path, old_path + ".bak")
+    print(f"Migrated {len(logs)} entries from {old_path} to {new_path}")
+
+
+def _io_worker():
+    while True:
+        fn, args = _io_q.get()
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"Error in background write: {e}")
+        finally:
+            _io_q.task_done()
+
+
+def submit_io(fn, *args):
+    """
+    Runs fn(*args) on the background I/O thread so the capture loop doesn't
+    wait on the disk.
+    """
+    global _io_thread
+    if _io_thread is None:
+        _io_thread = threading.Thread(target=_io_worker, daemon=True)
+        _io_thread.start()
+    _io_q.put((fn, args))
+
+
+def flush_io():
+    """
+    Blocks until every write queued with submit_io() has finished.
+    """
+    _io_q.join()
@@ -0,0 +1,101 @@
+"""
+OCR of screenshots with in-process Tesseract instances on a thread pool.
+"""
+import os
+
+# Tesseract's own OpenMP threading is slower than running one single-threaded
+# worker per screenshot, so this must be set before tesserocr is imported.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import atexit
+import concurrent.futures
+import threading
+
+import numpy as np
+from PIL import Image
+from tesserocr import PyTessBaseAPI, OEM, PSM
+
+# OCR runs on one long-lived pool whose threads each keep their own Tesseract
+# instance, so the language data is only loaded once per thread. tesserocr
+# releases the GIL while recognizing, so the threads run in parallel.
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+_tess_local = threading.local()
+
+
+def _otsu(histogram):
+    """
+    Computes Otsu's threshold from a 256-bin grayscale histogram.
+    """
+    hist = np.asarray(histogram, dtype=np.float64)
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+    variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(variance))
+
+
+def preprocess_image(image):
+    """
+    Converts a screenshot to a half-size black and white image for OCR.
+    Tesseract's runtime is dominated by pixel count, and Retina captures
+    have far more resolution than it needs.
+    """
+    # Everything stays inside Pillow's C (or Pillow-SIMD) routines: bilinear
+    # resize, a histogram, and a lookup-table point op for the threshold
+    image = image.convert("L")
+    w, h = image.size
+    image = image.resize((w // 2, h // 2), Image.BILINEAR)
+    thr = _otsu(image.histogram())
+    return image.point([255 if p > thr else 0 for p in range(256)])
+
+
+def _get_tess_api():
+    """
+    Returns this thread's Tesseract instance, creating it on first use.
+    A single uniform block is faster than automatic layout analysis on screen UI.
+    """
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        api = PyTessBaseAPI(lang="eng", psm=PSM.SINGLE_BLOCK, oem=OEM.LSTM_ONLY)
+        atexit.register(api.End)
+        _tess_local.api = api
+    return api
+
+
+def _get_ocr_pool():
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) // 2),
+                thread_name_prefix="ocr")
+    return _ocr_pool
+
+
+def _ocr(image):
+    try:
+        api = _get_tess_api()
+        api.SetImage(image)
+        return api.GetUTF8Text()
+    except Exception:
+        return None
+
+
+def extract_text(image):
+    """
+    Extracts text from a preprocessed screenshot using OCR. Returns None if OCR fails.
+    """
+    return _get_ocr_pool().submit(_ocr, image).result()
+
+
+def extract_texts(images):
+    """
+    Runs OCR on several preprocessed screenshots in parallel on the OCR pool.
+    Returns the extracted texts in the same order as images.
+    """
+    return list(_get_ocr_pool().map(_ocr, images))
+
@@ -0,0 +1,360 @@
+"""
+The capture loop: wires capture, OCR, the LLM and the log together.
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import datetime
+import os
+import re
+import signal
+import time
+
+from .batch import batch_flush_interval, collect_batches, queue_batch_request, submit_batch
+from .capture import dhash, get_active_application, grab, seconds_since_input
+from .llm import (
+    analyze_packed, cache_get, cache_put, encode_image, failed_result, is_failed,
+    load_local_model, save_cache,
+)
+from .log import flush_io, log_file, log_summary, migrate_log, submit_io
+from .ocr import extract_text, extract_texts, preprocess_image
+
+interval = 5 * 60
+# The loop wakes every tick to check for user activity, backing off up to
+# max_idle_tick while the user has been idle for more than idle_threshold
+tick = 30
+max_idle_tick = 5 * 60
+idle_threshold = 60
+save_dir = os.path.expanduser("./productivity/screenshots")
+
+# Screenshots are summarized BATCH_SIZE at a time in a single request
+BATCH_SIZE = 10
+pack_flush_interval = 30 * 60
+pending = collections.deque()
+# The most recently started flush; each flush waits on the one before it
+_flush_task = None
+# At most this many flushes run OCR/LLM requests at the same time
+max_concurrent_flushes = 2
+
+# Screens with fewer distinct words than this (e.g. just menu bar chrome) are
+# logged from the OCR text alone without calling the LLM
+min_distinct_words = 6
+min_text_chars = 40
+
+# Screenshots within dhash_threshold bits of the last analyzed one reuse its result
+dhash_threshold = 4
+_last_hash = None
+_last_entry = None
+_last_result = None
+_last_batch_request = None
+
+
+def is_unchanged(h):
+    """
+    Returns True if hash h is close enough to the last analyzed screenshot.
+    """
+    return _last_hash is not None and bin(h ^ _last_hash).count("1") <= dhash_threshold
+
+
+def analyze_without_llm(extracted_text):
+    """
+    Returns a result for screenshots that don't need the LLM, otherwise None.
+    """
+    if extracted_text is None:
+        return {"text": "Error during OCR", "category": "Error"}
+
+    if not extracted_text.strip():
+        return {"text": "No text detected", "category": "Idle/Empty Screen"}
+
+    words = re.findall(r"[A-Za-z]{3,}", extracted_text)
+    alnum_chars = sum(c.isalnum() for c in extracted_text)
+    if len(set(words)) < min_distinct_words or alnum_chars < min_text_chars:
+        return {"text": " ".join(words[:20]) or "No text detected",
+                "category": "Idle/Empty Screen"}
+
+    return None
+
+
+def remember_result(log_entry, analysis):
+    """
+    Keeps analysis around for the following unchanged screenshots if
+    log_entry is still the last analyzed one. A failed result is dropped
+    instead so the next screenshot goes through OCR and the LLM again.
+    """
+    global _last_hash, _last_result
+
+    # Later captures may have moved on to a different screen in the meantime
+    if log_entry is not _last_entry:
+        return
+    if is_failed(analysis) or analysis["category"] == "Error":
+        _last_hash = None
+        _last_result = None
+    else:
+        _last_result = analysis
+
+
+async def flush_pending(entries, vision=False, semaphore=None, previous=None):
+    """
+    Runs OCR on the given pending screenshots, sends the ones that need the LLM
+    in a single request and logs the results. With vision, the queued
+    screenshot data URLs are sent to the model directly and OCR is skipped.
+
+    OCR runs in a worker thread so the event loop keeps capturing while this
+    flush waits on the LLM. Results are only logged after the previous flush
+    task has finished, which keeps the log in order. Returns the result of
+    the last entry, which the next flush's unchanged entries fall back on.
+    Entries are logged even if OCR or the LLM request fails.
+    """
+    # Entries without an image are unchanged from the screenshot before them
+    changed = [i for i, (_, image) in enumerate(entries) if image is not None]
+
+    analyses = [None] * len(entries)
+    async with semaphore or contextlib.nullcontext():
+        try:
+            if vision:
+                items = {i: entries[i][1] for i in changed}
+                needs_llm = changed
+            else:
+                texts = await asyncio.to_thread(extract_texts, [entries[i][1] for i in changed])
+                items = dict(zip(changed, texts))
+                needs_llm = []
+                for i in changed:
+                    analyses[i] = analyze_without_llm(items[i]) or cache_get(items[i])
+                    if analyses[i] is None:
+                        needs_llm.append(i)
+            if needs_llm:
+                results = await analyze_packed([items[i] for i in needs_llm], vision)
+                for i, analysis in zip(needs_llm, results):
+                    analyses[i] = analysis
+                    if not vision:
+                        cache_put(items[i], analysis)
+                if not vision:
+                    save_cache()
+        except Exception as e:
+            print(f"Error summarizing pending screenshots: {e}")
+            for i in changed:
+                if analyses[i] is None:
+                    analyses[i] = failed_result()
+
+    fallback = _last_result
+    if previous is not None:
+        try:
+            fallback = await previous
+        except Exception:
+            fallback = None
+
+    for i in range(len(entries)):
+        if analyses[i] is None:
+            analyses[i] = analyses[i - 1] if i > 0 else fallback
+        if analyses[i] is None:
+            analyses[i] = failed_result()
+    if changed:
+        remember_result(entries[changed[-1]][0], analyses[changed[-1]])
+
+    for (log_entry, _), analysis in zip(entries, analyses):
+        log_entry["summary"] = analysis["text"]
+        log_entry["category"] = analysis["category"]
+        submit_io(log_summary, log_entry)
+        print(f"Summary ({analysis['category']} - {log_entry['application']}):\n{analysis['text']}\n")
+    print(f"Logged {len(entries)} summaries to: {log_file}")
+    return analyses[-1]
+
+
+def start_flush(vision=False, semaphore=None):
+    """
+    Moves everything in pending into a new background flush task.
+    """
+    global _flush_task
+    if pending:
+        entries = list(pending)
+        pending.clear()
+        _flush_task = asyncio.create_task(
+            flush_pending(entries, vision, semaphore, _flush_task))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Periodically summarize what is on the screen.")
+    parser.add_argument(
+        "--batch-mode", action="store_true",
+        help="queue summaries for the OpenAI Batch API instead of calling it synchronously")
+    parser.add_argument(
+        "--vision", action="store_true",
+        help="send downscaled screenshots to the model instead of OCR text")
+    parser.add_argument(
+        "--keep-screenshots", action="store_true",
+        help=f"save each screenshot to {save_dir} for debugging")
+    return parser.parse_args()
+
+
+def submit_pending_batch():
+    """
+    Submits the pending Batch API requests. Screenshots taken afterwards can't
+    reuse the result of a request that is no longer pending.
+    """
+    global _last_batch_request
+    batch_id = submit_batch()
+    if batch_id is not None:
+        _last_batch_request = None
+    return batch_id
+
+
+def capture_once(args):
+    """
+    Captures one screenshot and either logs, queues or skips its analysis.
+    """
+    global _last_hash, _last_entry, _last_result, _last_batch_request
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    # Get active application name
+    active_app = get_active_application()
+
+    # Capture a screenshot
+    try:
+        screenshot = grab()
+    except Exception as e:
+        print(f"\nError capturing screenshot, skipping this interval: {e}")
+        return
+    print(f"\nCaptured screenshot: {timestamp}")
+
+    log_entry = {
+        "timestamp": timestamp,
+        "application": active_app,
+    }
+
+    if args.keep_screenshots:
+        filename = os.path.join(save_dir, f"screenshot_{timestamp}.png")
+        # The I/O thread gets its own copy; screenshot is still used below
+        submit_io(screenshot.copy().save, filename)
+        log_entry["screenshot"] = filename
+
+    # Skip OCR and the LLM entirely if the screen hasn't changed
+    h = dhash(screenshot)
+    unchanged = is_unchanged(h)
+    # Entries still waiting in pending or in a running flush must be logged
+    # first to keep the order
+    flushing = _flush_task is not None and not _flush_task.done()
+    if unchanged and _last_result is not None and not pending and not flushing:
+        log_entry["summary"] = _last_result["text"]
+        log_entry["category"] = _last_result["category"]
+        submit_io(log_summary, log_entry)
+        print(f"Screen unchanged, reusing previous summary ({active_app})")
+        return
+
+    if unchanged and args.batch_mode and _last_batch_request is None:
+        # The previous result is in an already submitted batch
+        unchanged = False
+
+    if unchanged:
+        image = None
+    else:
+        if args.vision:
+            image = encode_image(screenshot)
+        else:
+            # Only the small black and white version is kept around for OCR
+            image = preprocess_image(screenshot)
+        _last_hash = h
+        _last_entry = log_entry
+        _last_result = None
+    del screenshot
+
+    if not args.batch_mode:
+        # Queue the screenshot for a packed LLM request (after parallel OCR
+        # unless using vision)
+        pending.append((log_entry, image))
+        print(f"Queued for summary ({len(pending)}/{BATCH_SIZE})")
+        return
+
+    if image is None:
+        queue_batch_request(log_entry, None, same_as=_last_batch_request)
+        print(f"Screen unchanged, reusing queued batch summary ({active_app})")
+    elif args.vision:
+        queue_batch_request(log_entry, image, vision=True)
+        _last_batch_request = timestamp
+        print(f"Queued for batch summary ({active_app})")
+    else:
+        extracted_text = extract_text(image)
+        analysis = analyze_without_llm(extracted_text) or cache_get(extracted_text)
+
+        if analysis is None:
+            queue_batch_request(log_entry, extracted_text)
+            _last_batch_request = timestamp
+            print(f"Queued for batch summary ({active_app})")
+        else:
+            log_entry["summary"] = analysis["text"]
+            log_entry["category"] = analysis["category"]
+            submit_io(log_summary, log_entry)
+            remember_result(log_entry, analysis)
+
+    collect_batches()
+
+
+async def run(args):
+    """
+    Runs the capture loop. Packed summary requests are started as background
+    tasks so the next screenshots are captured (and OCR'd) while they run.
+    """
+    if args.batch_mode:
+        collect_batches()
+    last_flush = time.time()
+    last_capture = 0
+    idle_streak = 0
+    semaphore = asyncio.Semaphore(max_concurrent_flushes)
+
+    # Treat SIGTERM like Ctrl+C so pending work is still flushed
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, asyncio.current_task().cancel)
+
+    try:
+        while True:
+            if args.batch_mode:
+                if time.time() - last_flush >= batch_flush_interval:
+                    submit_pending_batch()
+                    last_flush = time.time()
+            elif len(pending) >= BATCH_SIZE or time.time() - last_flush >= pack_flush_interval:
+                start_flush(args.vision, semaphore)
+                last_flush = time.time()
+
+            # Don't capture anything while the user is away
+            if seconds_since_input() > idle_threshold:
+                idle_streak += 1
+                await asyncio.sleep(min(tick * 2 ** idle_streak, max_idle_tick))
+                continue
+            idle_streak = 0
+
+            if time.time() - last_capture >= interval:
+                last_capture = time.time()
+                capture_once(args)
+
+            await asyncio.sleep(tick)
+    finally:
+        if args.batch_mode:
+            submit_pending_batch()
+        else:
+            start_flush(args.vision, semaphore)
+        if _flush_task is not None:
+            await _flush_task
+
+
+def main():
+    args = parse_args()
+    os.makedirs(save_dir, exist_ok=True)
+    migrate_log()
+
+    if args.keep_screenshots:
+        print(f"Screenshot storage: {save_dir}")
+    print(f"Summaries will be logged to: {log_file}")
+    if not args.vision and not args.batch_mode and load_local_model():
+        print("Categorizing with the local model")
+    # print(f"Taking a screenshot every {interval / 60} minutes. Press Ctrl+C to stop.")
+
+    try:
+        asyncio.run(run(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        flush_io()
+    print("\nScreenshot capture stopped.")
+
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+pytest.importorskip("openai")
+pytest.importorskip("tesserocr")
+pytest.importorskip("tiktoken")
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from concentrack import pipeline  # noqa: E402
+
+TEXT = "alpha bravo charlie delta echo foxtrot golf hotel india juliett kilo lima"
+RESULT = {"text": "Editing code", "category": "Coding"}
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    """
+    Runs capture_once/flush_pending without a screen, OCR or the LLM. Each
+    capture's application is taken from the apps list and its dhash from
+    hashes; returns the applications in the order they were logged.
+    """
+    logged = []
+    monkeypatch.setattr(pipeline, "pending", pipeline.collections.deque())
+    monkeypatch.setattr(pipeline, "_flush_task", None)
+    monkeypatch.setattr(pipeline, "_last_hash", None)
+    monkeypatch.setattr(pipeline, "_last_entry", None)
+    monkeypatch.setattr(pipeline, "_last_result", None)
+    monkeypatch.setattr(pipeline, "grab", lambda: object())
+    monkeypatch.setattr(pipeline, "preprocess_image", lambda screenshot: object())
+    monkeypatch.setattr(pipeline, "extract_texts", lambda images: [TEXT for _ in images])
+    monkeypatch.setattr(pipeline, "cache_get", lambda text: None)
+    monkeypatch.setattr(pipeline, "cache_put", lambda text, result: None)
+    monkeypatch.setattr(pipeline, "save_cache", lambda: None)
+    monkeypatch.setattr(pipeline, "submit_io", lambda fn, *args: fn(*args))
+    monkeypatch.setattr(pipeline, "log_summary", lambda entry: logged.append(entry["application"]))
+    return logged
+
+
+def capture(monkeypatch, app, h):
+    monkeypatch.setattr(pipeline, "get_active_application", lambda: app)
+    monkeypatch.setattr(pipeline, "dhash", lambda screenshot: h)
+    pipeline.capture_once(argparse.Namespace(batch_mode=False, vision=False, keep_screenshots=False))
+
+
+def test_unchanged_capture_waits_for_running_flush(monkeypatch, logged):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def analyze_packed(items, vision=False):
+            await release.wait()
+            return [dict(RESULT) for _ in items]
+
+        monkeypatch.setattr(pipeline, "analyze_packed", analyze_packed)
+
+        capture(monkeypatch, "t000", 0)
+        pipeline.start_flush()
+        flush_a = pipeline._flush_task
+        # Queued behind t000 since flush A hasn't produced a result yet
+        capture(monkeypatch, "t001", 0)
+        release.set()
+        await flush_a
+
+        # Flush B only holds t001 and hasn't run yet when t002 is captured in
+        # the same tick, so t002 must not be logged ahead of it
+        pipeline.start_flush()
+        capture(monkeypatch, "t002", 0)
+        pipeline.start_flush()
+        await pipeline._flush_task
+
+    asyncio.run(scenario())
+    assert logged == ["t000", "t001", "t002"]
+
+
+def test_unchanged_capture_is_logged_directly_when_idle(monkeypatch, logged):
+    async def scenario():
+        async def analyze_packed(items, vision=False):
+            return [dict(RESULT) for _ in items]
+
+        monkeypatch.setattr(pipeline, "analyze_packed", analyze_packed)
+
+        capture(monkeypatch, "t000", 0)
+        pipeline.start_flush()
+        await pipeline._flush_task
+        capture(monkeypatch, "t001", 0)
+
+    asyncio.run(scenario())
+    assert logged == ["t000", "t001"]
+    assert not pipeline.pending